@@ -2,9 +2,18 @@
 # The collected data should be appended to the 'data.csv' file.
 
 import streamlit as st
-import pandas as pd
-import json  # To read study spots from data.json
-import os    # File checks
+from utils.data import (
+    JSON_PATH,
+    append_ratings,
+    file_mtime,
+    json_payload,
+    load_prepared,
+    ratings_mtime,
+)
+
+# Submissions are buffered in Session State and written in one batch,
+# so k ratings cost one file open instead of k.
+AUTO_FLUSH_ROWS = 16
 
 # PAGE CONFIGURATION
 st.set_page_config(
@@ -14,38 +23,48 @@ st.set_page_config(
 
 # PAGE TITLE AND USER DIRECTIONS
 st.title("Data Collection Survey 📝")
-st.write("Pick a study spot and give it a rating. Your response is saved to **data.csv**.")
-
-CSV_PATH = "data.csv"
-JSON_PATH = "data.json"
+st.write(
+    "Pick a study spot and give it a rating. Ratings are buffered in your session and written to "
+    f"**data.csv** when you click **Save now** (or automatically every {AUTO_FLUSH_ROWS} ratings). "
+    "Unsaved ratings are lost if you close the tab."
+)
 
 
-def file_exists_and_not_empty(path: str) -> bool:
-    """Return True if the file exists and has at least one byte."""
-    return os.path.exists(path) and os.path.getsize(path) > 0
+# Default study spots, used when data.json has no usable labels.
+# A module-level tuple, so it isn't rebuilt on every rerun.
+_FALLBACK_SPOTS = (
+    "Library",
+    "Dorm",
+    "Clough Commons",
+    "Student Center",
+    "Klaus Atrium",
+    "Outdoor Greens",
+    "Dining Hall",
+)
 
 
 def load_spots_from_json() -> list[str]:
     """Load study spot labels from data.json → data_points[].label. Fallback to a default list."""
-    fallback = [
-        "Library",
-        "Dorm",
-        "Clough Commons",
-        "Student Center",
-        "Klaus Atrium",
-        "Outdoor Greens",
-        "Dining Hall",
-    ]
-    if file_exists_and_not_empty(JSON_PATH):
-        try:
-            with open(JSON_PATH, "r", encoding="utf-8") as f:
-                payload = json.load(f)
-            points = payload.get("data_points", [])
-            labels = [p.get("label") for p in points if isinstance(p, dict) and p.get("label")]
-            return labels or fallback
-        except Exception:
-            return fallback
-    return fallback
+    # Parsed once and shared with the Visuals page (see utils/data.py)
+    try:
+        points = json_payload(JSON_PATH, file_mtime(JSON_PATH)).get("data_points", [])
+        labels = [p.get("label") for p in points if isinstance(p, dict) and p.get("label")]
+        return labels or list(_FALLBACK_SPOTS)
+    except Exception:
+        return list(_FALLBACK_SPOTS)
+
+
+def flush_pending() -> int:
+    """Write all buffered ratings to data.csv (and data.parquet). Return the number of rows written."""
+    rows = st.session_state.get("pending", [])
+    if not rows:
+        return 0
+
+    # One locked write to data.csv, which also refreshes the Parquet copy Visuals reads
+    append_ratings(rows)
+
+    st.session_state["pending"] = []
+    return len(rows)
 
 
 # Load options once for the form
@@ -61,27 +80,48 @@ with st.form("survey_form"):
 
 # This block runs ONLY when the submit button is clicked.
 if submitted:
-    # Build a one-row DataFrame (column names match what Visuals.py expects)
-    new_row_df = pd.DataFrame([
-        {"category": spot, "value": rating}
-    ])
-
-    # Append or create the CSV
-    if file_exists_and_not_empty(CSV_PATH):
-        new_row_df.to_csv(CSV_PATH, mode="a", header=False, index=False)
+    st.session_state.setdefault("pending", []).append((spot, rating))
+    st.write(f"You chose **{spot}** and rated it **{rating}/10**.")
+
+    if len(st.session_state["pending"]) >= AUTO_FLUSH_ROWS:
+        st.session_state["last_saved"] = flush_pending()
     else:
-        new_row_df.to_csv(CSV_PATH, index=False)
+        st.info("Rating buffered — it is **not saved yet**.")
 
-    st.success("Saved! Your rating was added to data.csv.")
-    st.write(f"You chose **{spot}** and rated it **{rating}/10**.")
+
+def save_pending() -> None:
+    """Button callback: flush the buffer before the rerun, so the unsaved warning is current."""
+    st.session_state["last_saved"] = flush_pending()
+
+
+# Unsaved ratings and the manual save button
+pending_count = len(st.session_state.get("pending", []))
+if pending_count:
+    st.warning(
+        f"**{pending_count} rating(s) not saved yet.** They only live in this browser session "
+        "and will be lost if you close the tab. Click **Save now** to write them to data.csv."
+    )
+    st.button(f"Save now ({pending_count} rows)", type="primary", on_click=save_pending)
+
+last_saved = st.session_state.pop("last_saved", 0)
+if last_saved:
+    st.success(f"Saved! {last_saved} ratings were added to data.csv.")
 
 
 # DATA DISPLAY (helps you verify rows are being added)
 st.divider()
 st.header("Current Data in CSV")
 
-if file_exists_and_not_empty(CSV_PATH):
-    current_data_df = pd.read_csv(CSV_PATH)
-    st.dataframe(current_data_df, use_container_width=True)
+# One stat call: the mtime both tells us whether there is data and keys the cache
+data_mtime = ratings_mtime()
+if data_mtime is not None:
+    try:
+        # Shares the cached parse with the Visuals page
+        csv_df, _ = load_prepared(data_mtime)
+    except Exception:
+        st.error("Could not read 'data.csv' right now. Refresh the page to try again.")
+    else:
+        current_data_df = csv_df[["category", "value"]]
+        st.dataframe(current_data_df, use_container_width=True)
 else:
     st.warning("The 'data.csv' file is empty or does not exist yet.")
@@ -2,9 +2,15 @@
 # It should read data from both 'data.csv' and 'data.json' to create graphs.
 
 import streamlit as st
-import pandas as pd
-import json  # The 'json' module is needed to work with JSON files.
-import os    # The 'os' module helps with file system operations.
+from utils.data import (
+    JSON_PATH,
+    compute_counts,
+    compute_top_avgs,
+    file_mtime,
+    load_json_bar,
+    ratings_mtime,
+    summarize,
+)
 
 # PAGE CONFIGURATION
 st.set_page_config(
@@ -16,51 +22,22 @@ st.set_page_config(
 st.title("Data Visualizations 📈")
 st.write("This page displays graphs based on the collected data.")
 
-CSV_PATH = "data.csv"
-JSON_PATH = "data.json"
-
 # DATA LOADING
-# A crucial step is to load the data from the files.
-# It's important to add error handling to prevent the app from crashing if a file is empty or missing.
-
-
-
-# 1) Load CSV safely
-if os.path.exists(CSV_PATH) and os.path.getsize(CSV_PATH) > 0:
-    try:
-        csv_df = pd.read_csv(CSV_PATH)
-    except Exception:
-        csv_df = pd.DataFrame(columns=["category", "value"])  # fallback
-else:
-    csv_df = pd.DataFrame(columns=["category", "value"])  # empty structure
-
-# Ensure a numeric column for charts that need numbers
-if "value" in csv_df.columns:
-    csv_df["numeric_value"] = pd.to_numeric(csv_df["value"], errors="coerce")
-else:
-    csv_df["numeric_value"] = pd.Series(dtype=float)
-
-# Simple order index (handy if needed later)
-csv_df["entry_index"] = range(1, len(csv_df) + 1)
-
-# 2) Load JSON safely
-if os.path.exists(JSON_PATH) and os.path.getsize(JSON_PATH) > 0:
-    try:
-        with open(JSON_PATH, "r", encoding="utf-8") as f:
-            json_payload = json.load(f)
-    except Exception:
-        json_payload = {"chart_title": "JSON Chart", "data_points": []}
-else:
-    json_payload = {"chart_title": "JSON Chart", "data_points": []}
-
-# Convert JSON "data_points" into a DataFrame for easy plotting
-json_points = json_payload.get("data_points", [])
-json_df = pd.DataFrame(json_points)
-if not json_df.empty and {"label", "value"}.issubset(json_df.columns):
-    # Index on label so st.bar_chart can use it directly
-    json_bar_df = json_df.rename(columns={"label": "Label", "value": "Value"}).set_index("Label")[["Value"]]
-else:
-    json_bar_df = pd.DataFrame({"Value": []})
+# Loading and preparation live in utils/data.py. Each result is cached on its file's
+# mtime, so reruns only re-parse when the ratings or data.json actually change.
+data_mtime = ratings_mtime()
+# Per-spot total/avg/count; the charts below are cached slices of this table.
+# Only this K-row table is loaded here, never the full ratings frame.
+try:
+    summary = summarize(data_mtime)
+except Exception:
+    # Failures aren't cached, so the next rerun tries again; show empty charts meanwhile
+    st.error("Could not read 'data.csv' right now. Refresh the page to try again.")
+    data_mtime = None
+    summary = summarize(data_mtime)
+# The summary index is already sorted by category
+all_categories = summary.index.tolist()
+json_bar_df = load_json_bar(JSON_PATH, file_mtime(JSON_PATH))
 
 st.success("Data loaded. If files are empty, placeholder structures are used.")
 
@@ -80,11 +57,6 @@ if not json_bar_df.empty:
 else:
     st.warning("No valid JSON data to plot yet.")
 
-# Prepare category list from CSV for dynamic charts
-all_categories = (
-    sorted([c for c in csv_df["category"].dropna().unique()]) if "category" in csv_df.columns else []
-)
-
 # Use Session State in a simple, explicit way
 if "favorites" not in st.session_state:
     st.session_state["favorites"] = []  # persistent list across interactions  #NEW
@@ -94,7 +66,7 @@ st.subheader("Graph 2: Average rating per spot")
 # - Dynamic line chart driven by multiselect + Top-K slider.
 # - Uses Session State for a persistent favorites list.
 
-if csv_df["numeric_value"].notna().sum() == 0:
+if summary["avg"].isna().all():
     st.warning("No numeric values in **data.csv** yet. Submit ratings on the Survey page.")
 else:
     picked = st.multiselect(  #NEW
@@ -105,7 +77,9 @@ else:
     )
 
     if st.button("Add current picks to favorites"):  #NEW
-        st.session_state["favorites"] = sorted(list({*st.session_state["favorites"], *picked}))
+        # all_categories is already sorted, so one ordered pass replaces set + list + sort
+        wanted = set(picked) | set(st.session_state["favorites"])
+        st.session_state["favorites"] = [c for c in all_categories if c in wanted]
         st.success(f"Favorites updated: {st.session_state['favorites']}")
 
     top_k = st.slider(  #NEW
@@ -115,19 +89,9 @@ else:
         value=min(5, len(all_categories) if all_categories else 1),
     )
 
-    # Filter to selected + favorites
-    filt_df = csv_df.dropna(subset=["numeric_value"]).copy()
+    # Average rating per spot for selected + favorites (cached per selection and Top-K)
     effective = set(picked) | set(st.session_state["favorites"])
-    if effective:
-        filt_df = filt_df[filt_df["category"].isin(list(effective))]
-
-    # Average rating per spot
-    avgs = (
-        filt_df.groupby("category", as_index=False)["numeric_value"]
-        .mean()
-        .rename(columns={"numeric_value": "avg_rating"})
-    )
-    avgs = avgs.sort_values("avg_rating", ascending=False).head(top_k)
+    avgs = compute_top_avgs(data_mtime, tuple(sorted(effective)), top_k)
 
     if not avgs.empty:
         # LINE CHART with explicit x/y so categories appear on the x-axis
@@ -140,18 +104,15 @@ else:
 st.subheader("Graph 3: Number of ratings per spot")
 # - Dynamic scatter chart that counts how many ratings each spot has received.
 
-if len(csv_df) == 0 or not all_categories:
+if summary["count"].sum() == 0 or not all_categories:
     st.warning("Add some ratings on the Survey page to see this chart.")
 else:
     # Reuse the same selection and favorites
     selected = st.session_state.get("picked_categories", all_categories)
     effective = set(selected) | set(st.session_state["favorites"])
 
-    count_df = csv_df.copy()  # counts don't require numeric values
-    if effective:
-        count_df = count_df[count_df["category"].isin(list(effective))]
-
-    counts = count_df.groupby("category", as_index=False).size().rename(columns={"size": "num_ratings"})
+    # Counts per spot (cached per selection; they don't require numeric values)
+    counts = compute_counts(data_mtime, tuple(sorted(effective)))
 
     show_k = st.slider(  #NEW
         "Show Top K spots (by number of ratings)",
@@ -161,7 +122,7 @@ else:
         key="topk_counts",
     )
 
-    counts = counts.sort_values("num_ratings", ascending=False).head(show_k)
+    counts = counts.head(show_k)
 
     if not counts.empty:
         # SCATTER CHART with categorical x and numeric y
@@ -0,0 +1 @@
+# Shared helpers used by the pages in this app.
@@ -0,0 +1,322 @@
+# Shared data loading for the Survey and Visuals pages.
+# Streamlit reruns a page on every widget change, so the parsing and preparation
+# below is cached and only redone when one of the files actually changes.
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+import json  # The 'json' module is needed to work with JSON files.
+import os    # The 'os' module helps with file system operations.
+import csv        # Writes rows and splits the CSV header line
+import io         # Wraps the newly appended CSV bytes for read_csv
+import threading  # Guards the shared CSV parse state
+
+# orjson parses faster than the stdlib json module; it is optional.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+CSV_PATH = "data.csv"
+JSON_PATH = "data.json"
+# Columnar copy of data.csv used by the read path. It is a derived cache: data.csv
+# stays the source of truth and the copy is rebuilt whenever it is older than the CSV.
+PARQUET_PATH = "data.parquet"
+
+# Declaring dtypes up front skips pandas' type inference. Ratings are 1–10,
+# so Int16 is plenty; "category" keeps spot names as small integer codes.
+CSV_DTYPES = {"category": "category", "value": "Int16"}
+# data.csv can be edited by hand, so both columns are read as text and cleaned per row
+# (blank spots are dropped, see coerce_ratings for values) instead of failing the whole parse.
+CSV_READ_DTYPES = {"category": str, "value": str}
+
+
+def probe(path: str) -> tuple[bool, float]:
+    """Return (has at least one byte, mtime) from a single stat call; (False, 0.0) if missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False, 0.0
+    return stat.st_size > 0, stat.st_mtime
+
+
+def file_exists_and_not_empty(path: str) -> bool:
+    """Return True if the file exists and has at least one byte."""
+    return probe(path)[0]
+
+
+def file_mtime(path: str) -> float | None:
+    """Return the file's mtime, or None if it is missing or empty."""
+    not_empty, mtime = probe(path)
+    return mtime if not_empty else None
+
+
+def ratings_mtime() -> float | None:
+    """Return the mtime of data.csv, the source of truth for the ratings (None if missing/empty)."""
+    return file_mtime(CSV_PATH)
+
+
+def empty_csv_df() -> pd.DataFrame:
+    """Return an empty ratings frame with the same dtypes as a parsed CSV."""
+    return pd.DataFrame({col: pd.Series(dtype=dt) for col, dt in CSV_DTYPES.items()})
+
+
+def coerce_ratings(values: pd.Series) -> pd.Series:
+    """Convert raw rating cells to Int16; anything that isn't a whole number 1–10 becomes NA."""
+    numeric = pd.to_numeric(values, errors="coerce")
+    valid = numeric.between(1, 10) & (numeric % 1 == 0)
+    return numeric.where(valid).astype("Int16")
+
+
+# data.csv is append-only, so only the bytes added since the last read need parsing.
+# This state is shared by all sessions, hence cache_resource and the lock.
+@st.cache_resource(show_spinner=False)
+def _csv_tail_state(path: str) -> dict:
+    """Return the parsed frame, byte offset and file identity reached so far for `path`."""
+    return {
+        "df": empty_csv_df(),
+        "offset": 0,
+        "header": None,
+        "ino": None,   # inode of the file the offset belongs to
+        "head": b"",   # leading bytes of that file, to spot in-place rewrites
+        "lock": threading.Lock(),
+    }
+
+
+# How many leading bytes identify the file (the header plus the first rows)
+_HEAD_BYTES = 256
+
+
+def _reset_tail_state(state: dict) -> None:
+    """Forget everything parsed so far, so the next read starts from the top."""
+    state["df"], state["offset"], state["header"] = empty_csv_df(), 0, None
+    state["ino"], state["head"] = None, b""
+
+
+def load_csv(path: str) -> pd.DataFrame:
+    """Parse the ratings CSV, reading only the rows appended since the last call.
+
+    Only parsing is incremental: adding the new rows and returning the copy still
+    touch the whole frame. Returns a copy, so callers may modify it. Raises if the
+    file can't be read or parsed, so a failure is never mistaken for "no ratings".
+    """
+    state = _csv_tail_state(path)
+    with state["lock"]:
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                head = f.read(_HEAD_BYTES)
+                if (
+                    stat.st_ino != state["ino"]
+                    or stat.st_size < state["offset"]
+                    or head[:len(state["head"])] != state["head"]
+                ):
+                    # File was replaced, truncated or rewritten: start over from the top
+                    _reset_tail_state(state)
+                    state["ino"] = stat.st_ino
+                # Still the same file; remember the (possibly longer) prefix for next time
+                state["head"] = head
+
+                f.seek(state["offset"])
+                new_bytes = f.read()
+
+            # Only parse complete lines; a row still being written is picked up next time
+            end = new_bytes.rfind(b"\n") + 1
+            if end:
+                at_start = state["offset"] == 0
+                # Only category/value are parsed, even if the survey adds columns later.
+                # Tail chunks have no header line, so reuse the names from the first one.
+                new_df = pd.read_csv(
+                    io.BytesIO(new_bytes[:end]),
+                    header=0 if at_start else None,
+                    names=None if at_start else state["header"],
+                    usecols=list(CSV_DTYPES),
+                    dtype=CSV_READ_DTYPES,
+                    engine="c",
+                    on_bad_lines="skip",  # a malformed line drops that row, not the file
+                )
+                if at_start:
+                    header_line = new_bytes.split(b"\n", 1)[0].decode("utf-8").rstrip("\r")
+                    state["header"] = next(csv.reader([header_line]))
+
+                # A row without a spot can't be charted, so drop it like a bad value
+                new_df = new_df.dropna(subset=["category"])
+                new_df = new_df.assign(value=coerce_ratings(new_df["value"]))
+
+                # Encode only the new rows, using the existing category dtype. The old
+                # frame is re-encoded only when a new spot shows up, and the categories
+                # stay sorted so all_categories keeps its order.
+                old_df = state["df"]
+                old_cat = old_df["category"]
+                known = set(old_cat.cat.categories)
+                added = [c for c in new_df["category"].unique() if c not in known]
+                if added:
+                    old_cat = old_cat.cat.set_categories(sorted([*known, *added]))
+                new_cat = pd.Series(pd.Categorical(new_df["category"], dtype=old_cat.dtype))
+                state["df"] = pd.DataFrame({
+                    "category": pd.concat([old_cat, new_cat], ignore_index=True),
+                    "value": pd.concat([old_df["value"], new_df["value"]], ignore_index=True),
+                })
+                state["offset"] += end
+        except Exception:
+            _reset_tail_state(state)
+            raise
+        return state["df"].copy()
+
+
+# Streamlit sessions run as threads of one process. This lock serializes every write
+# to data.csv and data.parquet so concurrent flushes can't interleave or lose rows.
+@st.cache_resource(show_spinner=False)
+def _write_lock() -> threading.Lock:
+    """Return the process-wide lock for ratings writes."""
+    return threading.Lock()
+
+
+def _write_parquet(df: pd.DataFrame) -> None:
+    """Replace data.parquet with `df`. Hold _write_lock() when calling."""
+    # Write to a temp file and swap it in, so readers never see a half-written file
+    tmp_path = f"{PARQUET_PATH}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, PARQUET_PATH)
+
+
+def load_ratings() -> pd.DataFrame:
+    """Read the ratings, from data.parquet when it is at least as new as data.csv.
+
+    A missing or stale Parquet copy is rebuilt from the CSV. Raises if the CSV
+    can't be parsed; nothing is written in that case, so a failed read is never
+    saved as an empty copy.
+    """
+    csv_not_empty, csv_mtime = probe(CSV_PATH)
+    if not csv_not_empty:
+        return empty_csv_df()
+
+    parquet_not_empty, parquet_mtime = probe(PARQUET_PATH)
+    if parquet_not_empty and parquet_mtime >= csv_mtime:
+        try:
+            return pd.read_parquet(PARQUET_PATH, columns=list(CSV_DTYPES))
+        except Exception:
+            pass  # unreadable copy: rebuild it below
+
+    with _write_lock():
+        df = load_csv(CSV_PATH)
+        try:
+            _write_parquet(df)
+        except Exception:
+            pass  # serve the CSV even if the copy can't be written
+        return df
+
+
+def append_ratings(rows: list[tuple[str, int]]) -> None:
+    """Append rows to data.csv, then refresh data.parquet from it."""
+    with _write_lock():
+        # Column names match what Visuals.py expects; the header is written only for a new file.
+        need_header = not file_exists_and_not_empty(CSV_PATH)
+        with open(CSV_PATH, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if need_header:
+                writer.writerow(["category", "value"])
+            writer.writerows(rows)
+
+        # The copy is rebuilt from the CSV rather than patched, so the two can't diverge.
+        # If this fails, the copy is left older than the CSV and the next read rebuilds it.
+        try:
+            _write_parquet(load_csv(CSV_PATH))
+        except Exception:
+            pass
+
+
+def load_json(path: str) -> dict:
+    """Parse the JSON reference file, falling back to an empty payload on errors."""
+    try:
+        # Read raw bytes: both parsers accept them, which skips a separate decode step
+        with open(path, "rb") as f:
+            return _json_loads(f.read())
+    except Exception:
+        return {"chart_title": "JSON Chart", "data_points": []}
+
+
+# One parsed payload shared by every session and both pages. Callers must treat it
+# as read-only. Pass file_mtime(path) as `mtime` (None for a missing/empty file).
+# max_entries=1 drops the old payload when data.json changes instead of keeping every version.
+@st.cache_resource(show_spinner=False, max_entries=1)
+def json_payload(path: str, mtime: float | None) -> dict:
+    """Return the parsed JSON file, or an empty payload if it is missing or invalid."""
+    if mtime is None:
+        return {"chart_title": "JSON Chart", "data_points": []}
+    return load_json(path)
+
+
+# The mtime is the cache key: editing the file invalidates the entry.
+# The TTL is only a safety net. Pass ratings_mtime() as `mtime`.
+@st.cache_data(show_spinner=False, ttl=600)
+def load_prepared(mtime: float | None) -> tuple[pd.DataFrame, list[str]]:
+    """Load the ratings and return (csv_df, all_categories). Raises if data.csv can't be read."""
+    # Only the category/value columns are read from Parquet
+    csv_df = load_ratings() if mtime is not None else empty_csv_df()
+
+    # "value" is already parsed as Int16, so no numeric coercion is needed
+    csv_df["numeric_value"] = csv_df["value"]
+
+    # Category list for the dynamic charts. The categorical dtype already keeps
+    # its categories sorted, so there's no need to collect and sort unique values.
+    all_categories = csv_df["category"].cat.categories.tolist()
+
+    return csv_df, all_categories
+
+
+# Cached separately from the ratings so new survey rows don't rebuild the static chart.
+# Pass file_mtime(path) as `mtime` (None for a missing/empty file).
+@st.cache_data(show_spinner=False, ttl=600)
+def load_json_bar(path: str, mtime: float | None) -> pd.DataFrame:
+    """Return the data.json baseline as a Label-indexed frame with one "Value" column."""
+    # Convert JSON "data_points" into a DataFrame for easy plotting
+    json_df = pd.DataFrame(json_payload(path, mtime).get("data_points", []))
+    if not json_df.empty and {"label", "value"}.issubset(json_df.columns):
+        # Index on label so st.bar_chart can use it directly
+        return json_df.rename(columns={"label": "Label", "value": "Value"}).set_index("Label")[["Value"]]
+    return pd.DataFrame({"Value": []})
+
+
+# Keyed on the same mtime as load_prepared, so it is rebuilt only when ratings change.
+@st.cache_data(show_spinner=False, ttl=600)
+def summarize(mtime: float | None) -> pd.DataFrame:
+    """Return per-category "total", "avg" and "count" of ratings, indexed by category."""
+    csv_df, _ = load_prepared(mtime)
+    g = csv_df.groupby("category", observed=True)["numeric_value"]
+    return pd.DataFrame({
+        "total": g.sum(),
+        "avg": g.mean().astype("float64"),  # plain floats from the nullable Int16 mean
+        "count": g.size(),
+    })
+
+
+def spot_mask(index: pd.CategoricalIndex, picked: tuple[str, ...]) -> np.ndarray:
+    """Return a boolean mask of the summary rows whose spot is in `picked`.
+
+    Compares the categorical's integer codes instead of the spot name strings.
+    """
+    wanted = index.categories.get_indexer(list(picked))
+    return np.isin(index.codes, wanted[wanted >= 0])
+
+
+# The chart data is a pure function of the ratings mtime and the widget state, so
+# switching back to an earlier selection is a cache hit. Pass `picked` as a sorted
+# tuple so the same selection always maps to the same key.
+@st.cache_data(show_spinner=False, ttl=600)
+def compute_top_avgs(mtime: float | None, picked: tuple[str, ...], top_k: int) -> pd.DataFrame:
+    """Return the top_k spots by average rating as columns "category" and "avg_rating"."""
+    summary = summarize(mtime)
+    if picked:
+        summary = summary[spot_mask(summary.index, picked)]
+    return summary["avg"].dropna().nlargest(top_k).rename("avg_rating").reset_index()
+
+
+@st.cache_data(show_spinner=False, ttl=600)
+def compute_counts(mtime: float | None, picked: tuple[str, ...]) -> pd.DataFrame:
+    """Return rating counts per spot, most-rated first, as columns "category" and "num_ratings"."""
+    counts = summarize(mtime)["count"]
+    if picked:
+        counts = counts[spot_mask(counts.index, picked)]
+    return counts.sort_values(ascending=False).rename("num_ratings").reset_index()